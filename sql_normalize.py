@@ -0,0 +1,69 @@
+"""
+Regex-based SQL normalization helpers used on every analysis pass.
+
+The module is fully type-annotated so it can be compiled with mypyc for a native speedup:
+
+    mypyc sql_normalize.py
+
+The compiled extension is picked up in place of this file automatically; without it,
+the pure-Python version below is used unchanged.
+"""
+import re
+from typing import List, Set
+
+# Regexes compiled once at import instead of on every call
+_LITERAL_RE = re.compile(r"'[^']*'|\b\d+\b")
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+`?([a-zA-Z_][a-zA-Z0-9_.]*)`?', re.IGNORECASE)
+_WHERE_RE = re.compile(r'\bWHERE\b(.*)', re.IGNORECASE | re.DOTALL)
+_SPLIT_RE = re.compile(r'\bAND\b|\bOR\b', re.IGNORECASE)
+_COL_RE = re.compile(r'\s*([A-Za-z_]\w*)\s*(>=|<=|=|>|<)')
+
+def fingerprint(query: str) -> str:
+    """
+    Normalizes a SQL query into a fingerprint by replacing string and numeric literals
+    with '?' placeholders, so queries differing only in their literals share a plan.
+    
+    :param query: The SQL query string to normalize.
+    :return: The normalized query fingerprint.
+    """
+    return _LITERAL_RE.sub("?", query.strip())
+
+def regex_tables(query: str) -> Set[str]:
+    """
+    Extracts table names referenced after FROM, JOIN, UPDATE or INTO using a basic regex approach.
+    
+    :param query: The SQL query (or fingerprint) from which to extract table names.
+    :return: A set of lower-cased table names.
+    """
+    matches: List[str] = _TABLE_RE.findall(query)
+    return {name.split('.')[-1].lower() for name in matches}
+
+def regex_columns_from_where(query: str) -> List[str]:
+    """
+    Extracts column names from the WHERE clause using a basic regex approach.
+    Assumes conditions appear in the form: column operator value.
+    
+    :param query: The SQL query from which to extract column names in the WHERE clause.
+    :return: A list of column names used in the WHERE clause.
+    """
+    # Cheap substring test before running any regex
+    if 'WHERE' not in query.upper():
+        return []
+    
+    # Attempt to locate the WHERE clause
+    where_clause = _WHERE_RE.search(query)
+    if not where_clause:
+        return []
+    
+    conditions: str = where_clause.group(1)
+    # Split by AND/OR (basic approach)
+    parts: List[str] = _SPLIT_RE.split(conditions)
+    
+    columns: List[str] = []
+    for part in parts:
+        # Look for the pattern: column operator ...
+        match = _COL_RE.match(part.strip())
+        if match:
+            columns.append(match.group(1))
+    
+    return columns
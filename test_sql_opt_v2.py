@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("mysql.connector")
+pytest.importorskip("sqlglot")
+
+import sql_opt_v2
+
+
+def _count_alarms(durations):
+    sql_opt_v2.STATS.clear()
+    alarms = 0
+    for elapsed_us in durations:
+        sql_opt_v2.record_execution("SELECT * FROM users WHERE id = 1", elapsed_us)
+        stats = sql_opt_v2.STATS[sql_opt_v2.fingerprint("SELECT * FROM users WHERE id = 1")]
+        alarms += stats["regressed"]
+        stats["regressed"] = False
+    return alarms
+
+
+def test_step_change_raises_single_alarm():
+    durations = [1000 + (i % 5) * 10 for i in range(100)] + [2000 + (i % 5) * 10 for i in range(300)]
+    assert _count_alarms(durations) == 1
+
+
+def test_single_spike_raises_no_alarm():
+    assert _count_alarms([1000] * 50 + [100000] + [1000] * 50) == 0
+
+
+def test_query_structure_keeps_qualified_table_name():
+    tables, table_columns = sql_opt_v2.analyze_query_structure(
+        "SELECT * FROM shop.OrderItems oi JOIN users u ON u.id = oi.user_id WHERE oi.Qty > 3 AND status = 1"
+    )
+    assert tables == {"oi": ("shop", "OrderItems"), "u": ("users",)}
+    # The unqualified column is ambiguous in a join and is not attributed to any table
+    assert table_columns == {"oi": ("Qty",)}
+
+
+def test_index_ddl_quotes_each_name_part():
+    ddl = sql_opt_v2.build_index_ddl(("shop", "Order`Items"), ["Qty", "Qty", "created at"])
+    assert ddl == "CREATE INDEX `idx_Order_Items_Qty_created_at` ON `shop`.`Order``Items` (`Qty`, `created at`);"
+
+
+def test_index_ddl_truncates_long_names_with_hash():
+    first = sql_opt_v2.build_index_ddl("orders", ["a" * 40, "b" * 40])
+    second = sql_opt_v2.build_index_ddl("orders", ["a" * 40, "b" * 41])
+    first_name = first.split("`")[1]
+    assert len(first_name) == sql_opt_v2.MAX_IDENTIFIER_LENGTH
+    assert first_name != second.split("`")[1]
+
+
+def test_sampled_query_bounds_rows_read():
+    plan = (sql_opt_v2.plan_row_type(("table", "type", "rows"))("oi", "ALL", 5000),)
+    sample_rows = sql_opt_v2.sample_size(plan, 10)
+    assert sample_rows == 500
+    assert sql_opt_v2.sampled_query("SELECT * FROM shop.OrderItems oi WHERE oi.Qty > 3", sample_rows) == (
+        "SELECT * FROM (SELECT * FROM shop.OrderItems LIMIT 500) AS oi WHERE oi.Qty > 3"
+    )
+    # Joins and queries already bounded by LIMIT are timed in full
+    assert sql_opt_v2.sampled_query("SELECT * FROM a JOIN b ON a.id = b.id", 500) is None
+    assert sql_opt_v2.sampled_query("SELECT * FROM a LIMIT 10", 500) is None